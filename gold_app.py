@@ -1,6 +1,8 @@
+import sys
 import streamlit as st
 import akshare as ak
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
@@ -12,6 +14,28 @@ st.set_page_config(page_title="黄金全周期深度分析", layout="wide")
 st.title("🏆 黄金实时行情与多周期复利深度看板")
 
 
+# --- 0. 紧凑数据层：数值列向下转型，并记录各缓存函数返回数据的内存占用 ---
+def compact_frame(df):
+    """数值列向下转型 (float64→float32，int64→最小整型)，返回新的副本，不修改传入的 DataFrame"""
+    df = df.copy()
+    # downcast='float' 仅在 float32 与原值误差超过约 5e-4 时才保留 float64，
+    # 因此价格及其派生的 ROI/CAGR 在多数情况下会以 float32 计算和存储
+    for col in df.select_dtypes('float').columns:
+        df[col] = pd.to_numeric(df[col], downcast='float')
+    for col in df.select_dtypes('integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def frame_memory_kb(df):
+    """返回 DataFrame 的实际内存占用 (KB，含 object 列内容)"""
+    return df.memory_usage(deep=True).sum() / 1024
+
+
+# 各缓存函数本次运行返回数据的内存占用，页面底部侧边栏统一展示
+mem_report = {}
+
+
 # --- 1. 顶部：实时行情 ---
 def get_realtime_gold():
     try:
@@ -54,11 +78,13 @@ def get_macro_data_from_fred():
         # 筛选近 1 年数据
         one_year_ago = datetime.now() - timedelta(days=365)
         df_macro = df_macro[df_macro['date'] >= one_year_ago].dropna()
-        return df_macro
+        return compact_frame(df_macro.reset_index(drop=True))
     except Exception as e:
         st.error(f"FRED 接口调用失败，请检查 Key 或网络: {e}")
         return None
 macro_df = get_macro_data_from_fred()
+if macro_df is not None:
+    mem_report['宏观数据 (FRED)'] = frame_memory_kb(macro_df)
 
 if macro_df is not None and not macro_df.empty:
     # 创建双 Y 轴图表
@@ -117,9 +143,11 @@ else:
 def get_gold_daily_data():
     # 获取原始日线数据
     df = ak.spot_hist_sge(symbol="Au99.99")
-    df['date'] = pd.to_datetime(df['date'])
-    # 仅保留日期和收盘价
-    df_daily = df[['date', 'close']].rename(columns={'close': 'price'})
+    # 仅保留日期和收盘价，收盘价向下转型为 float32，其余列随原始帧一起释放
+    df_daily = pd.DataFrame({
+        'date': pd.to_datetime(df['date']),
+        'price': pd.to_numeric(df['close'], downcast='float'),
+    })
     return df_daily
 
 
@@ -132,6 +160,7 @@ def get_cb_alpha_analysis(df_gold_daily):
         bond_df = bond_yield.reset_index()
         bond_df.columns = ['date', 'yield']
         bond_df['date'] = pd.to_datetime(bond_df['date'])
+        bond_df = compact_frame(bond_df)
 
         # 建立索引进行日级合并
         df_cb = pd.merge(df_gold_daily, bond_df, on='date', how='inner')
@@ -140,15 +169,18 @@ def get_cb_alpha_analysis(df_gold_daily):
         # pct_change() 在日级数据上能反映最真实的博弈动量
         df_cb['corr'] = df_cb['price'].pct_change().rolling(30).corr(df_cb['yield'].pct_change())
 
-        return df_cb.tail(365)  # 只看近一年
+        return compact_frame(df_cb.tail(365).reset_index(drop=True))  # 只看近一年
     except Exception as e:
         st.error(f"去美元化日级分析失败: {e}")
         return None
 
 # 1. 获取日级金价
 df_daily = get_gold_daily_data()
+mem_report['金价日线'] = frame_memory_kb(df_daily)
 # 3. 渲染“去美元化”日级看板
 cb_df = get_cb_alpha_analysis(df_daily)
+if cb_df is not None:
+    mem_report['金价-美债合并'] = frame_memory_kb(cb_df)
 
 if cb_df is not None:
     # 绘制相关性曲线
@@ -331,6 +363,7 @@ def get_msi_history(df_daily, cb_df, macro_df):
 
 # --- UI 渲染历史图表 ---
 msi_hist_df = get_msi_history(df_daily, cb_df, macro_df)
+mem_report['MSI 历史'] = frame_memory_kb(msi_hist_df)
 
 fig_msi = go.Figure()
 fig_msi.add_trace(go.Scatter(
@@ -355,37 +388,96 @@ fig_msi.update_layout(
 st.plotly_chart(fig_msi, use_container_width=True)
 
 # --- C. 基于动量的震荡箱体预测 ---
+@st.cache_data(ttl=3600)
+def simulate_box_forecast(prices, horizon=30, n_paths=20000, block_size=5,
+                          chunk_size=5000, quantiles=(0.2, 0.8), seed=2026):
+    """块自助法 (Block Bootstrap) 蒙特卡洛：用全历史日收益一次性批量模拟未来价格路径"""
+    prices = np.asarray(prices, dtype=np.float64)
+    # 先剔除缺失/非正价格再差分，避免缺口两侧的收益被拼接进同一个块
+    prices = prices[np.isfinite(prices) & (prices > 0)]
+    if len(prices) == 0:
+        return None
+    log_ret = np.diff(np.log(prices))
+    if len(log_ret) < block_size * 2:
+        return None
+
+    rng = np.random.default_rng(seed)
+    curr = prices[-1]
+    n_blocks = -(-horizon // block_size)  # 向上取整
+    offsets = np.arange(block_size)
+
+    # 只保留每条路径的终值、最低价、最高价，分块生成路径以控制内存
+    terminal = np.empty(n_paths)
+    path_min = np.empty(n_paths)
+    path_max = np.empty(n_paths)
+    for start in range(0, n_paths, chunk_size):
+        n = min(chunk_size, n_paths - start)
+        # 随机抽取连续收益块的起点，保留波动聚集等短期相关性
+        block_starts = rng.integers(0, len(log_ret) - block_size + 1, size=(n, n_blocks))
+        idx = (block_starts[:, :, None] + offsets).reshape(n, -1)[:, :horizon]
+        paths = curr * np.exp(np.cumsum(log_ret[idx], axis=1))
+        terminal[start:start + n] = paths[:, -1]
+        path_min[start:start + n] = paths.min(axis=1)
+        path_max[start:start + n] = paths.max(axis=1)
+
+    # 支撑/阻力取终值分布的经验分位数，触及概率为路径期间内曾触碰该价位的比例
+    support, resistance = np.quantile(terminal, quantiles)
+    return {
+        'support': float(support),
+        'resistance': float(resistance),
+        'median': float(np.median(terminal)),
+        'touch_support': float((path_min <= support).mean()),
+        'touch_resistance': float((path_max >= resistance).mean()),
+        'n_paths': n_paths,
+        'block_size': block_size,
+        'horizon': horizon,
+    }
+
+
 st.subheader("📦 未来 30 天震荡箱体预测")
 curr_price = df_daily['price'].iloc[-1]
-# 逻辑：动量越高，向上波动的概率越大；动量回落，向下寻找支撑
-# 波动率估算 (利用过去 30 天标准差)
-volatility = df_daily['price'].tail(30).std()
+# 逻辑：用全历史日收益做块自助蒙特卡洛，得到经验支撑/阻力位及触及概率
+box = simulate_box_forecast(df_daily['price'].to_numpy())
+if box is not None:
+    mem_report['箱体预测结果'] = (sys.getsizeof(box) + sum(sys.getsizeof(v) for v in box.values())) / 1024
 
+if box is not None:
+    support, resistance = box['support'], box['resistance']
+else:
+    # 历史数据不足时回退：利用过去 30 天标准差估算，动量越高箱体越向上偏移
+    volatility = df_daily['price'].tail(30).std()
+    if msi_val > 60:
+        support, resistance = curr_price - volatility, curr_price + (volatility * 1.5)
+    elif msi_val < 40:
+        support, resistance = curr_price - (volatility * 1.5), curr_price + volatility
+    else:
+        support, resistance = curr_price - volatility, curr_price + volatility
+
+# 动量仅用于提示短期情绪，模拟箱体本身不随 MSI 变化
 if msi_val > 60:
-    support, resistance = curr_price - volatility, curr_price + (volatility * 1.5)
-    box_msg = "🔥 **动量偏强**：价格大概率向上测试阻力位，回调空间有限。"
+    box_msg = "🔥 **动量偏强**：短期买盘情绪占优，波动可能放大，追涨需谨慎。"
 elif msi_val < 40:
-    support, resistance = curr_price - (volatility * 1.5), curr_price + volatility
-    box_msg = "❄️ **动量偏弱**：价格大概率向下寻找支撑，短期突破乏力。"
+    box_msg = "❄️ **动量偏弱**：短期市场情绪低迷，观望气氛较浓。"
 else:
-    support, resistance = curr_price - volatility, curr_price + volatility
-    box_msg = "⚖️ **均衡震荡**：价格将在窄幅区间内洗盘，消化高位压力。"
+    box_msg = "⚖️ **均衡震荡**：动量处于中性区间，多空力量相对均衡。"
 
 p_col1, p_col2 = st.columns(2)
 p_col1.metric("预测支撑位 (地板)", f"￥{support:.2f}")
 p_col2.metric("预测阻力位 (天花板)", f"￥{resistance:.2f}")
+if box is not None:
+    st.caption(f"基于 {box['n_paths']} 条模拟路径 ({box['block_size']} 日块自助法)："
+               f"{box['horizon']} 天内触及支撑概率 {box['touch_support']:.0%}，"
+               f"触及阻力概率 {box['touch_resistance']:.0%}，终值中位数 ￥{box['median']:.2f}")
 st.write(box_msg)
 
 st.divider()
 
 
 # --- 2. 数据处理：计算多周期 ROI 与 年化收益 ---
-# (以下代码保持原样，未做任何逻辑修改)
 @st.cache_data(ttl=3600)
-def get_gold_analysis_data():
-    df = ak.spot_hist_sge(symbol="Au99.99")
-    df['date'] = pd.to_datetime(df['date'])
-    df_m = df.resample('M', on='date')['close'].mean().reset_index()
+def get_gold_analysis_data(df_gold_daily):
+    # 复用已缓存的日线数据，不再重复下载
+    df_m = df_gold_daily.resample('M', on='date')['price'].mean().reset_index()
     df_m.columns = ['month', 'price']
 
     # 定义周期（月）
@@ -401,23 +493,26 @@ def get_gold_analysis_data():
         # 还原总 ROI 为百分比供图表 2/3 使用
         df_m[f'roi_{label}'] = df_m[f'roi_{label}'] * 100
 
-    df_m['color_1y'] = df_m['roi_1y'].apply(lambda x: 'red' if x >= 0 else 'green')
-    return df_m
+    # 用布尔列标记涨跌，颜色在绘图时再映射，避免逐行 Python 字符串列
+    df_m['up_1y'] = df_m['roi_1y'] >= 0
+    return compact_frame(df_m)
 
 
 try:
-    df = get_gold_analysis_data()
+    df = get_gold_analysis_data(df_daily)
+    mem_report['月度多周期收益'] = frame_memory_kb(df)
 
     # --- 图表 1: 价格与 1年 ROI 点标注 ---
     st.header("2. 价格走势与年度 ROI (红正绿负)")
     fig1 = go.Figure()
     fig1.add_trace(go.Scatter(x=df['month'], y=df['price'], mode='lines', line=dict(color='lightgrey'), name='月均价'))
     df_p = df[df['roi_1y'].notna()]
+    color_1y = np.where(df_p['up_1y'], 'red', 'green')
     fig1.add_trace(go.Scatter(
         x=df_p['month'], y=df_p['price'], mode='markers+text',
-        marker=dict(color=df_p['color_1y'], size=6),
+        marker=dict(color=color_1y, size=6),
         text=df_p['roi_1y'].apply(lambda x: f"{x:.0f}%"),
-        textposition="top center", textfont=dict(size=8, color=df_p['color_1y']),
+        textposition="top center", textfont=dict(size=8, color=color_1y),
         name='1年ROI'
     ))
     st.plotly_chart(fig1, use_container_width=True)
@@ -501,4 +596,11 @@ try:
     st.table(df_plan)
 
 except Exception as e:
-    st.error(f"分析失败: {e}")
\ No newline at end of file
+    st.error(f"分析失败: {e}")
+
+# --- 侧边栏：各缓存函数返回数据的内存占用 ---
+st.sidebar.header("🧮 返回数据内存占用")
+for name, kb in mem_report.items():
+    st.sidebar.write(f"{name}: **{kb:.1f} KB**")
+st.sidebar.caption(f"合计: {sum(mem_report.values()):.1f} KB "
+                   "(st.cache_data 每次运行反序列化后返回的副本大小，非缓存内部存储)")